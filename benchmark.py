@@ -0,0 +1,388 @@
+__author__ = "Jon Ball"
+__version__ = "Winter 2023"
+
+# Python 3.9.1
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import subprocess
+import tempfile
+import argparse
+import itertools
+import random
+import json
+import time
+import sys
+import os
+
+from instrumentation import peak_rss_mb
+
+# Stages timed by the suite, in pipeline order
+STAGES = [
+    "citation_scan",
+    "get_author_edges",
+    "eric_parse",
+    "api_data_fields",
+    "process_docs",
+    "preprocess_docs",
+]
+
+# Items generated per stage at scale 1x
+BASE_SIZES = {
+    "articles": 10,       # article .txt files for citation_scan
+    "authors": 500,       # citing authors for get_author_edges
+    "eric_records": 500,  # records per ERIC year file
+    "api_docs": 200,      # docs per ERIC API response
+    "issns": 10,          # journals for process_docs, 20 abstracts each
+    "paragraphs": 200,    # paragraphs for preprocess_docs
+}
+
+FIRST_NAMES = ["james", "maria", "robert", "linda", "michael", "susan", "david", "karen",
+               "richard", "nancy", "joseph", "lisa", "thomas", "betty", "charles", "sandra"]
+LAST_NAMES = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis",
+              "rodriguez", "martinez", "hernandez", "lopez", "gonzalez", "wilson", "anderson",
+              "thomas", "taylor", "moore", "jackson", "martin", "lee", "perez", "thompson", "white"]
+JOURNALS = ["Sociology of Education", "American Sociological Review", "American Journal of Sociology",
+            "Social Forces", "Educational Researcher", "Review of Educational Research"]
+WORDS = ("school student teacher class inequality achievement family parent college "
+         "education policy race gender curriculum tracking reform outcome effect "
+         "social capital network mobility attainment district peer").split()
+
+
+### SYNTHETIC CORPUS GENERATORS ###
+def random_name(rng):
+    return f"{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}"
+
+
+def random_sentence(rng, n_words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def asa_reference(rng):
+    # e.g. Smith, James, and Maria Garcia. 2004. "Title." Sociology of Education 77(2):123-45.
+    last, first = rng.choice(LAST_NAMES).title(), rng.choice(FIRST_NAMES).title()
+    coauthors = [random_name(rng) for _ in range(rng.randint(0, 2))]
+    authors = ", ".join([f"{last}, {first}"] + coauthors[:-1])
+    if coauthors:
+        authors += ", and " + coauthors[-1]
+    title = random_sentence(rng, rng.randint(4, 9))[:-1]
+    page = rng.randint(1, 400)
+    return (f"{authors}. {rng.randint(1960, 2019)}{rng.choice(['', 'a', 'b'])}. "
+            f"\"{title}.\" {rng.choice(JOURNALS)} {rng.randint(1, 90)}({rng.randint(1, 4)}):"
+            f"{page}-{page + rng.randint(5, 30)}.")
+
+
+def article_text(rng, n_paragraphs=40, n_references=60):
+    # Title page with authors and year, body paragraphs, then an ASA reference list
+    header = [
+        random_sentence(rng, 8)[:-1].upper(),
+        " and ".join(random_name(rng) for _ in range(rng.randint(1, 3))),
+        f"Sociology of Education {rng.randint(1994, 2022)}, Vol. {rng.randint(60, 95)}",
+    ]
+    body = [" ".join(random_sentence(rng) for _ in range(5)) for _ in range(n_paragraphs)]
+    references = ["REFERENCES"] + [asa_reference(rng) for _ in range(n_references)]
+    return "\n\n".join(header + body + references)
+
+
+def write_articles(output_dir, n, rng):
+    os.makedirs(output_dir, exist_ok=True)
+    for i in range(n):
+        with open(os.path.join(output_dir, f"article{i}.txt"), "w") as wfile:
+            wfile.write(article_text(rng))
+
+
+def citation_dict(n_authors, rng, alpha=2.1):
+    # Out-degrees follow a Pareto tail and cited authors a Zipf-like popularity,
+    # so both degree distributions are power-law
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(n_authors)]
+    # Cumulative weights are built once; passing plain weights would rebuild them per author
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** (alpha - 1) for rank in range(n_authors)))
+    data = {}
+    for author in authors:
+        degree = min(int(rng.paretovariate(alpha - 1)), n_authors)
+        data[author] = rng.choices(authors, cum_weights=cum_weights, k=degree)
+    return data
+
+
+def eric_year_xml(n_records, rng):
+    # Same layout as the ERIC bulk download (https://eric.ed.gov/?download)
+    records = []
+    for i in range(n_records):
+        records.append(
+            "<record><metadata>"
+            f"<dc:title>{random_sentence(rng, 8)}</dc:title>"
+            f"<dc:creator>{random_name(rng)}</dc:creator>"
+            f"<dc:description>{' '.join(random_sentence(rng) for _ in range(6))} (Author)</dc:description>"
+            f"<dc:subject>{rng.choice(WORDS)}</dc:subject>"
+            f"<eric:issn>ISSN-{rng.randint(0, 9999):04d}-{rng.randint(0, 9999):04d}</eric:issn>"
+            f"<dcterms:accessRights>Yes</dcterms:accessRights>"
+            "</metadata></record>")
+    return ("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+            "<records xmlns:eric=\"http://www.eric.ed.gov\" "
+            "xmlns:dc=\"http://purl.org/dc/elements/1.1/\" "
+            "xmlns:dcterms=\"http://purl.org/dc/terms/\">"
+            + "".join(records) + "</records>")
+
+
+def api_response_xml(n_docs, rng):
+    # Same layout as a Solr response from the ERIC API (https://eric.ed.gov/?api)
+    docs = []
+    for i in range(n_docs):
+        authors = "".join(f"<str>{random_name(rng)}</str>" for _ in range(rng.randint(1, 3)))
+        docs.append(
+            "<doc>"
+            f"<str name=\"id\">EJ{i:06d}</str>"
+            f"<str name=\"title\">{random_sentence(rng, 8)}</str>"
+            f"<str name=\"description\">{' '.join(random_sentence(rng) for _ in range(4))}</str>"
+            f"<arr name=\"author\">{authors}</arr>"
+            f"<arr name=\"subject\"><str>{rng.choice(WORDS)}</str></arr>"
+            f"<int name=\"publicationdateyear\">{rng.randint(1990, 2022)}</int>"
+            "</doc>")
+    return ("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<response>"
+            f"<result name=\"response\" numFound=\"{n_docs}\" start=\"0\">"
+            + "".join(docs) + "</result></response>")
+
+
+def generate_corpus(output_dir, scale, seed=1):
+    """
+    Write every synthetic input at the given scale and return the item counts used.
+    """
+    rng = random.Random(seed)
+    sizes = {k: v * scale for k, v in BASE_SIZES.items()}
+    write_articles(os.path.join(output_dir, "txts"), sizes["articles"], rng)
+    with open(os.path.join(output_dir, "author_citations.json"), "w") as wfile:
+        json.dump(citation_dict(sizes["authors"], rng), wfile)
+    with open(os.path.join(output_dir, "eric05.xml"), "w") as wfile:
+        wfile.write(eric_year_xml(sizes["eric_records"], rng))
+    with open(os.path.join(output_dir, "api_response.xml"), "w") as wfile:
+        wfile.write(api_response_xml(sizes["api_docs"], rng))
+    issn2doc = {
+        f"ISSN-{i:04d}": "\n\n".join(" ".join(random_sentence(rng) for _ in range(6)) for _ in range(20))
+        for i in range(sizes["issns"])}
+    with open(os.path.join(output_dir, "issn2doc.json"), "w") as wfile:
+        json.dump(issn2doc, wfile)
+    paragraphs = [" ".join(random_sentence(rng) for _ in range(5)) for _ in range(sizes["paragraphs"])]
+    with open(os.path.join(output_dir, "paragraphs.json"), "w") as wfile:
+        json.dump(paragraphs, wfile)
+    return sizes
+
+
+### STAGE RUNNERS ###
+# Each returns (callable to time, number of items it processes)
+def load_nlp(model_name):
+    from spacy_loader import load_spacy
+    if model_name == "stub":
+        return load_spacy("blank")
+    try:
+        return load_spacy(model_name)
+    except OSError:
+        print(f"spaCy model {model_name} not installed; using a blank English stub.")
+        return load_spacy("blank")
+
+
+def setup_citation_scan(data_dir, model_name):
+    import citations
+    citations.nlp = load_nlp(model_name)
+    txt_dir = os.path.join(data_dir, "txts")
+    paths = [os.path.join(txt_dir, f) for f in sorted(os.listdir(txt_dir))]
+    return lambda: [citations.citation_scan(p) for p in paths], len(paths)
+
+
+def setup_get_author_edges(data_dir, model_name):
+    from graph import get_author_edges
+    with open(os.path.join(data_dir, "author_citations.json"), "r") as rfile:
+        data = json.load(rfile)
+    return lambda: get_author_edges(data), sum(len(v) for v in data.values())
+
+
+def setup_eric_parse(data_dir, model_name):
+    from eric_parser import ERICparser
+    path = os.path.join(data_dir, "eric05.xml")
+    parser = ERICparser()
+    parser.parse(path)
+    n_records = len(parser.root)
+    return lambda: ERICparser().parse(path), n_records
+
+
+def setup_api_data_fields(data_dir, model_name):
+    from eric_parser import APIparser
+    path = os.path.join(data_dir, "api_response.xml")
+
+    def run():
+        parser = APIparser()
+        parser.parse(path)
+        return parser.data_fields()
+
+    probe = APIparser()
+    probe.parse(path)
+    return run, probe.num_docs
+
+
+def setup_process_docs(data_dir, model_name):
+    from doc2vec import process_docs
+    nlp = load_nlp(model_name)
+    with open(os.path.join(data_dir, "issn2doc.json"), "r") as rfile:
+        issn2doc = json.load(rfile)
+    n_abstracts = sum(len(doc.split("\n\n")) for doc in issn2doc.values())
+    return lambda: process_docs(issn2doc, nlp), n_abstracts
+
+
+def setup_preprocess_docs(data_dir, model_name):
+    from dytm import preprocess_docs
+    nlp = load_nlp(model_name)
+    with open(os.path.join(data_dir, "paragraphs.json"), "r") as rfile:
+        paragraphs = json.load(rfile)
+    return lambda: preprocess_docs(paragraphs, nlp), len(paragraphs)
+
+
+SETUPS = {name: globals()["setup_" + name] for name in STAGES}
+
+
+def time_stage(stage, data_dir, model_name, repeats=5):
+    """
+    Time one stage on one corpus and keep the best of several runs.
+    Runs in a fresh process so peak RSS is the stage's own.
+    """
+    os.environ["TQDM_DISABLE"] = "1"
+    try:
+        run, n_items = SETUPS[stage](data_dir, model_name)
+    except ImportError as e:
+        return {"status": "skipped", "error": str(e)}
+    rss_before = peak_rss_mb()
+    times = []
+    try:
+        for _ in range(repeats):
+            tock = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - tock)
+    except ImportError as e:
+        # Some stages import their heavy dependencies on first call rather than at setup
+        return {"status": "skipped", "error": str(e)}
+    seconds = min(times)
+    return {
+        "status": "ok",
+        "items": n_items,
+        "seconds": round(seconds, 4),
+        "median_seconds": round(sorted(times)[len(times) // 2], 4),
+        "throughput": round(n_items / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+### STARTUP ###
+# Commands that should start in well under a second with heavy imports deferred
+def startup_commands(data_dir):
+    py = sys.executable
+    here = os.path.dirname(os.path.abspath(__file__))
+    commands = {f"{script} --help": [py, os.path.join(here, script), "--help"] for script in
+                ["pdf2txt.py", "citations.py", "graph.py", "doc2vec.py", "dytm.py", "pipeline.py"]}
+    commands["graph.py --metrics_only"] = [
+        py, os.path.join(here, "graph.py"), "--metrics_only",
+        "-i", os.path.join(data_dir, "author_citations.json"),
+        "-o", os.path.join(data_dir, "graphs")]
+    return commands
+
+
+def time_startup(data_dir, repeats=5, budget=1.0):
+    """
+    Time each startup command end to end and keep the best of several runs.
+    """
+    results = []
+    for label, command in startup_commands(data_dir).items():
+        times = []
+        for _ in range(repeats):
+            tock = time.perf_counter()
+            proc = subprocess.run(command, capture_output=True)
+            times.append(time.perf_counter() - tock)
+            if proc.returncode != 0:
+                break
+        if proc.returncode != 0:
+            error = proc.stderr.decode().strip().splitlines()[-1:] or ["exit " + str(proc.returncode)]
+            r = {"stage": label, "scale": 1, "status": "skipped", "error": error[0]}
+            print(f"   {label}: skipped ({r['error']})")
+        else:
+            r = {"stage": label, "scale": 1, "status": "ok", "items": 1,
+                 "seconds": round(min(times), 4), "median_seconds": round(sorted(times)[len(times) // 2], 4)}
+            flag = "" if r["seconds"] < budget else f"  OVER {budget}s BUDGET"
+            print(f"   {label}: {r['seconds']}s{flag}")
+        results.append(r)
+    return results
+
+
+### RESULTS ###
+def compare(results, baseline, threshold):
+    # Flag any stage whose time grew by more than threshold over the baseline
+    previous = {(r["stage"], r["scale"]): r for r in baseline["results"] if r["status"] == "ok"}
+    slowdowns = []
+    for r in results["results"]:
+        base = previous.get((r["stage"], r["scale"]))
+        if r["status"] != "ok" or base is None:
+            continue
+        ratio = r["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        if ratio > 1 + threshold:
+            slowdowns.append((r["stage"], r["scale"], ratio))
+            print(f"SLOWDOWN {r['stage']} at {r['scale']}x: "
+                  f"{base['seconds']}s -> {r['seconds']}s ({ratio:.2f}x)")
+    if not slowdowns:
+        print(f"No slowdowns beyond {threshold:.0%} of the baseline.")
+    return slowdowns
+
+
+def main(scales, stages, model_name, output, baseline=None, threshold=0.2, startup=False, repeats=5):
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "model": model_name,
+        "results": [],
+    }
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if startup:
+            print("Timing entry point startup...")
+            generate_corpus(os.path.join(tmpdir, "startup"), 1)
+            results["results"] += time_startup(os.path.join(tmpdir, "startup"), repeats)
+            scales = []
+        for scale in scales:
+            data_dir = os.path.join(tmpdir, f"{scale}x")
+            print(f"Generating synthetic corpus at {scale}x...")
+            generate_corpus(data_dir, scale)
+            for stage in stages:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    r = executor.submit(time_stage, stage, data_dir, model_name, repeats).result()
+                r = {"stage": stage, "scale": scale, **r}
+                results["results"].append(r)
+                if r["status"] == "ok":
+                    print(f"   {stage}: {r['items']} items in {r['seconds']}s "
+                          f"({r['throughput']}/s, peak {r['peak_rss_mb']} MB)")
+                else:
+                    print(f"   {stage}: skipped ({r['error']})")
+
+    if os.path.dirname(output) and not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, "w") as wfile:
+        json.dump(results, wfile, indent=2)
+    print(f"Results saved to {output}.")
+
+    if baseline:
+        with open(baseline, "r") as rfile:
+            return not compare(results, json.load(rfile), threshold)
+    return True
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scales", type=int, nargs="+", default=[1, 10, 100], help="Corpus scales to benchmark")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to benchmark")
+    parser.add_argument("-m", "--model", default="en_core_web_sm", help="spaCy model, or 'stub' for a blank pipeline")
+    parser.add_argument("-o", "--output", default="data/bench/results.json", help="Path for the JSON results")
+    parser.add_argument("-b", "--baseline", default=None, help="Results JSON to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2, help="Fractional slowdown to flag")
+    parser.add_argument("--startup", action="store_true", help="Time entry point startup instead of the stages")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="Runs per measurement; the best is kept")
+    args = parser.parse_args()
+
+    ok = main(args.scales, args.stages, args.model, args.output, args.baseline, args.threshold,
+              args.startup, args.repeats)
+    sys.exit(0 if ok else 1)
@@ -5,11 +5,13 @@ from collections import Counter, defaultdict
 from tqdm import tqdm
 import argparse
 import string
-import spacy
 import json
 import re
 import os
 
+from instrumentation import span, add_profile_args, profiling
+from spacy_loader import load_spacy
+
 
 def get_filenames(input_dir):
     # Walk through the input directory and find all the text files
@@ -26,7 +28,8 @@ def author_scan(line):
     # Many author names are separated by semicolons
     newline = line.replace(";", " ")
 
-    doc = nlp(newline)
+    with span("citations.ner", items=1):
+        doc = nlp(newline)
         
     auts = []
     for ent in doc.ents:
@@ -113,7 +116,8 @@ def main(input_dir, output_dir):
     journals = []
 
     for txt in tqdm(txts):
-        d = citation_scan(txt)
+        with span("citations.citation_scan", items=1):
+            d = citation_scan(txt)
         # Save a mapping of text file to year of publication
         txt2year[txt] = d["year"]
         # Save a mapping of primary authors to cited authors
@@ -149,8 +153,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-i", "--input_dir", help="Input directory of text files")
     parser.add_argument("-o", "--output_dir", help="Output directory for preprocessed text files")
+    add_profile_args(parser)
     args = parser.parse_args()
 
-    nlp = spacy.load("en_core_web_lg")
+    with profiling(args):
+        nlp = load_spacy("en_core_web_lg")
 
-    main(args.input_dir, args.output_dir)
\ No newline at end of file
+        main(args.input_dir, args.output_dir)
\ No newline at end of file
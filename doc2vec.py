@@ -3,30 +3,30 @@ __verion__ = "Winter 2023"
 
 # Python 3.9.1
 
-from gensim.models import Doc2Vec
-from gensim.models.doc2vec import TaggedDocument
-from sklearn.manifold import TSNE
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import spacy
+# gensim, sklearn, matplotlib and numpy are imported where they are used,
+# so that --help and imports of this module stay fast
+from typing import TYPE_CHECKING
 from tqdm import tqdm
 
 from collections import defaultdict
+import argparse
 import json
 import time
 import os
 import re
 
-from eric_parser import ERICParser
+from eric_parser import ERICparser
+from instrumentation import span, add_profile_args, profiling
+from spacy_loader import load_spacy
+
+if TYPE_CHECKING:
+    from gensim.models import Doc2Vec
+    from gensim.models.doc2vec import TaggedDocument
 
 # Main function
-def main():
+def main(eric_dir: str = "eric_data"):
     # Load the .xml files representing the ERIC database (https://eric.ed.gov/?download)
-    paths = xml_paths("eric_data")
+    paths = xml_paths(eric_dir)
     # Parse the files and save a document for each ISSN, with abstracts split by "\n\n"
     issn2doc = parse_eric_xmls(paths)
     # Process the data and save as Gensim TaggedDocuments
@@ -37,10 +37,14 @@ def main():
     visualize_model(model)
 
 def visualize_model(
-    model: Doc2Vec,
+    model: "Doc2Vec",
     output_dir: str = "data/vsm/"
     ) -> None:
     """Given a trained doc2vec model, visualize the model."""
+    from sklearn.decomposition import PCA
+    from sklearn.cluster import KMeans
+    import matplotlib.pyplot as plt
+    import numpy as np
     # Get the vectors
     print("Retrieving doc vectors...")
     vectors = model.docvecs.vectors_docs
@@ -69,14 +73,15 @@ def visualize_model(
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     plt.savefig(output_dir + "vsm.png", bbox_inches="tight", dpi=1000)  
-    print("Plot saved.\n***"))        
+    print("Plot saved.\n***")        
 
 # Train the doc2vec model with logging
 # Hyperparameters are based on previous usage of doc2vec with the ERIC corpus
 def train_model(
-    corpus: list[TaggedDocument]
-    ) -> Doc2Vec:
+    corpus: list["TaggedDocument"]
+    ) -> "Doc2Vec":
     """Given a list of TaggedDocuments, train a doc2vec model."""
+    from gensim.models import Doc2Vec
     # Initialize the model
     print("Initializing the doc2vec model...")
     model = Doc2Vec(
@@ -93,24 +98,28 @@ def train_model(
     # Train the model
     print("Training the model...")
     tock = time.time()
-    model.train(corpus, total_examples=model.corpus_count, epochs=model.epochs)
+    with span("doc2vec.train", items=model.corpus_count):
+        model.train(corpus, total_examples=model.corpus_count, epochs=model.epochs)
     print(f"Model trained in {time.time() - tock} seconds.")
     return model
 
 # Tokenize the documents and return a list of TaggedDocuments
 def process_docs(
     docs: dict[str : str],
-    ) -> list[TaggedDocument]:
+    spacy_model = None
+    ) -> list["TaggedDocument"]:
     """Given a dictionary of documents, return a list of TaggedDocuments."""
+    from gensim.models.doc2vec import TaggedDocument
     # Convert the data dict to a list of TaggedDocuments
     tagged_docs = []
     # Spacy for tokenization
-    nlp = spacy.load("en_core_web_sm")
+    nlp = spacy_model or load_spacy("en_core_web_sm")
     for issn, doc in docs.items():
         # Split the document into abstracts
         abstracts = doc.split("\n\n")
         # Tokenize the entire document in chunks
-        tokenized_abstracts = [token.text for abstract in tqdm(abstracts) for token in nlp(abstract)]
+        with span("doc2vec.tokenize", items=len(abstracts)):
+            tokenized_abstracts = [token.text for abstract in tqdm(abstracts) for token in nlp(abstract)]
         # Add the document to the list of TaggedDocuments
         tagged_docs.append(TaggedDocument(tokenized_abstracts, [issn]))
     return tagged_docs
@@ -120,21 +129,23 @@ def parse_eric_xmls(
     paths_to_xml: list[str],
 ) -> dict[str : str]:
     """Given a list of paths to .xml files, parse the files and return a list of TaggedDocuments."""
-    eric_parser = ERICParser()
+    eric_parser = ERICparser()
     issn2doc = defaultdict(str)
     for path in paths_to_xml: # For each year's ERIC .xml file
         # Parse the .xml file
         eric_parser.parse(path)
         # Iterate over item records
-        for record in eric_parser.iter_metadata():
-            # Pull abstract of record
-            description = record.xpath("dc:description", namespaces=eric_parser.nsmap)[0].text
-            description = clean_string(description)
-            # Pull ISSN of record
-            issn = record.xpath("eric:issn", namespaces=eric_parser.nsmap)[0].text.strip()
-            if description and issn:
-                # Add the abstract to the dictionary of documents for a given ISSN
-                issn2doc[issn] += description + "\n\n" 
+        with span("eric.records") as records:
+            for record in eric_parser.iter_metadata():
+                # Pull abstract of record
+                description = record.xpath("dc:description", namespaces=eric_parser.nsmap)[0].text
+                description = clean_string(description)
+                # Pull ISSN of record
+                issn = record.xpath("eric:issn", namespaces=eric_parser.nsmap)[0].text.strip()
+                if description and issn:
+                    # Add the abstract to the dictionary of documents for a given ISSN
+                    issn2doc[issn] += description + "\n\n" 
+                records.add()
     print(f"{len(issn2doc)} unique ISSNs found.")
     return issn2doc
 
@@ -161,4 +172,13 @@ def xml_paths(
         for file in files:
             if re.search("9[0-9].xml|0[0-9].xml|1[0-9].xml", file): # 1990-2019
                 paths_to_xml.append(os.path.join(path, file))
-    return paths_to_xml
\ No newline at end of file
+    return paths_to_xml
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input_dir", default="eric_data", help="Directory of ERIC .xml files")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    with profiling(args):
+        main(args.input_dir)
@@ -1,48 +1,138 @@
 __author__ = "Jon Ball"
 __version__ = "Winter 2023"
 
-import spacy
-import gensim
-from gensim import corpora
-import pyLDAvis
+# gensim, pyLDAvis and numpy are imported where they are used,
+# so that --help and imports of this module stay fast
 from tqdm import tqdm
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
 import json
 import time
 import os
 import re
 
+from instrumentation import span, add_profile_args, profiling
+from spacy_loader import load_spacy
+
 ### DYNAMIC TOPIC MODELING ###
-def main():
+def main(
+    vis_only: bool = False,
+    workers: int = None
+) -> None:
+    from gensim.models.ldaseqmodel import LdaSeqModel
     # Load the corpus
     path_to_index = "data/txt2year.json"
     save_path = "data/ldaseq"
-    print("Loading corpus...")
-    print("Preparing corpus...")
-    dictionary, bow_corpus, time_slice = prepare_corpus(path_to_index)
-    print("Corpus prepared.")
-    # Train the ldaseqmodel
-    print("***\nTraining dynamic topic model...")
-    t0 = time.time()
-    ldaseq = gensim.models.ldaseqmodel.LdaSeqModel(
-        corpus=bow_corpus,
-        id2word=dictionary,
-        time_slice=time_slice,
-        num_topics=50,
-        passes=10,
-        random_state=1)
-    print(f"Dynamic topic model trained in {time.time() - t0} seconds.")
-    # Save the model
-    print("Saving dynamic topic model...")
-    ldaseq.save(save_path + "ldaseq20epochs50topics.model")
-    # Visualize the model at each time slice
-    for idx in range(len(time_slice)):
-        doctops, topterm, dlens, tfreq, vocab = ldaseq.dtm_vis(idx, bow_corpus)
-        print(f"Visualizing dynamic topic model at time slice {idx}...")
-        vis_data = pyLDAvis.gensim.prepare(doctops, topterm, dlens, tfreq, vocab)
-        pyLDAvis.save_html(vis_data, f"data/ldaseq/vis{idx}.html")
+    model_path = os.path.join(save_path, "ldaseq20epochs50topics.model")
+    if vis_only:
+        # Re-render from the saved model without retraining
+        print("Loading dynamic topic model...")
+        ldaseq = LdaSeqModel.load(model_path)
+        bow_corpus = load_bow_corpus("data/preprocessed_corpus.json", ldaseq.id2word)
+        print("Dynamic topic model loaded.")
+    else:
+        print("Loading corpus...")
+        print("Preparing corpus...")
+        dictionary, bow_corpus, time_slice = prepare_corpus(path_to_index)
+        print("Corpus prepared.")
+        # Train the ldaseqmodel
+        print("***\nTraining dynamic topic model...")
+        t0 = time.time()
+        with span("dytm.train", items=len(bow_corpus)):
+            ldaseq = LdaSeqModel(
+                corpus=bow_corpus,
+                id2word=dictionary,
+                time_slice=time_slice,
+                num_topics=50,
+                passes=10,
+                random_state=1)
+        print(f"Dynamic topic model trained in {time.time() - t0} seconds.")
+        # Save the model
+        print("Saving dynamic topic model...")
+        if not os.path.exists(save_path):
+            os.makedirs(save_path)
+        ldaseq.save(model_path)
+    # Extract the visualization arrays once, then render each time slice in parallel
+    print("Extracting visualization data...")
+    with span("dytm.extract_vis"):
+        extract_vis_data(ldaseq, bow_corpus, save_path)
+    print(f"Visualizing dynamic topic model at {ldaseq.num_time_slices} time slices...")
+    with span("dytm.render_vis", items=ldaseq.num_time_slices):
+        render_vis(save_path, ldaseq.num_time_slices, workers)
     print("Visualizations saved.\n***")
 
+### VISUALIZATION FUNCTIONS ###
+# Save the arrays pyLDAvis needs for every time slice
+def extract_vis_data(
+    ldaseq,
+    bow_corpus: list[list[tuple[int, int]]],
+    output_dir: str
+) -> None:
+    import numpy as np
+    # Same quantities as ldaseq.dtm_vis(), but the corpus-wide ones are computed once
+    # rather than once per time slice
+    doc_topic = ldaseq.gammas / ldaseq.gammas.sum(axis=1)[:, np.newaxis]
+    doc_lengths = np.array([len(doc) for doc in bow_corpus])
+    term_frequency = np.zeros(ldaseq.vocab_len)
+    for doc in bow_corpus:
+        for term, freq in doc:
+            term_frequency[term] += freq
+    vocab = [ldaseq.id2word[i] for i in range(len(ldaseq.id2word))]
+    np.save(os.path.join(output_dir, "doc_topic.npy"), doc_topic)
+    np.save(os.path.join(output_dir, "doc_lengths.npy"), doc_lengths)
+    np.save(os.path.join(output_dir, "term_frequency.npy"), term_frequency)
+    with open(os.path.join(output_dir, "vocab.json"), "w") as outfile:
+        json.dump(vocab, outfile)
+    # Topic-term distributions are the only slice-specific arrays
+    for idx in range(ldaseq.num_time_slices):
+        topic_term = np.array([
+            np.exp(chain.e_log_prob[:, idx]) / np.exp(chain.e_log_prob[:, idx]).sum()
+            for chain in ldaseq.topic_chains
+        ])
+        np.save(os.path.join(output_dir, f"topic_term{idx}.npy"), topic_term)
+    print(f"...visualization data saved in {output_dir}.")
+
+# Render every time slice in a process pool
+def render_vis(
+    vis_dir: str,
+    num_slices: int,
+    workers: int = None
+) -> None:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_slice, vis_dir, idx) for idx in range(num_slices)]
+        for future in as_completed(futures):
+            print(f"...saved {future.result()}")
+
+# Render a single time slice from the saved arrays
+def render_slice(
+    vis_dir: str,
+    idx: int
+) -> str:
+    import numpy as np
+    import pyLDAvis
+    with open(os.path.join(vis_dir, "vocab.json"), "r") as infile:
+        vocab = json.load(infile)
+    vis_data = pyLDAvis.prepare(
+        topic_term_dists=np.load(os.path.join(vis_dir, f"topic_term{idx}.npy")),
+        doc_topic_dists=np.load(os.path.join(vis_dir, "doc_topic.npy"), mmap_mode="r"),
+        doc_lengths=np.load(os.path.join(vis_dir, "doc_lengths.npy")),
+        vocab=vocab,
+        term_frequency=np.load(os.path.join(vis_dir, "term_frequency.npy")),
+        n_jobs=1) # The pool already runs one slice per process
+    html_path = os.path.join(vis_dir, f"vis{idx}.html")
+    pyLDAvis.save_html(vis_data, html_path)
+    return html_path
+
+# Rebuild the bow corpus from the preprocessed docs saved by prepare_corpus()
+def load_bow_corpus(
+    path_to_corpus: str,
+    dictionary
+) -> list[list[tuple[int, int]]]:
+    with open(path_to_corpus, "r") as infile:
+        preprocessed_corpus = json.load(infile)
+    return [dictionary.doc2bow(text) for text in preprocessed_corpus]
+
 ### PREPROCESSING FUNCTIONS ###
 # Prepare corpus
 def prepare_corpus(
@@ -65,10 +155,8 @@ def prepare_corpus(
         print(f"   ...docs: {len(fiveyear)}")
     print(f"...{len(docs)} docs read.")
     # Load the spacy model
-    nlp = spacy.load("en_core_web_lg")
-    nlp.add_pipe("merge_entities")
-    nlp.add_pipe("merge_subtokens")
-    
+    nlp = load_spacy("en_core_web_lg", pipes=("merge_entities", "merge_subtokens"))
+
     # Preprocess the text files by lemmatizing
     print("Preprocessing docs...")
     preprocessed_corpus = preprocess_docs(docs, nlp)
@@ -76,6 +164,7 @@ def prepare_corpus(
         json.dump(preprocessed_corpus, outfile)
     print("...preprocessed docs saved.")
     # Create a bow representation of the documents
+    from gensim import corpora
     dictionary = corpora.Dictionary(preprocessed_corpus)
     bow_corpus = [dictionary.doc2bow(text) for text in preprocessed_corpus]
 
@@ -88,10 +177,11 @@ def preprocess_docs(
 ) -> list[list[str]]:
     # Lemmatize the documents
     prepped_docs = []
-    for doc in tqdm(spacy_model.pipe(docs, batch_size=1000)):
-        prepped_docs.append(
-            [token.lemma_ for token in doc if not token.is_stop and not token.is_punct]
-        )
+    with span("dytm.lemmatize", items=len(docs)):
+        for doc in tqdm(spacy_model.pipe(docs, batch_size=1000)):
+            prepped_docs.append(
+                [token.lemma_ for token in doc if not token.is_stop and not token.is_punct]
+            )
     # Count word frequencies
     frequency = defaultdict(int)
     for doc in prepped_docs:
@@ -143,4 +233,11 @@ def group_files_byyear(
     return year2paths
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vis_only", action="store_true", help="Render visualizations from the saved model without retraining")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of processes for rendering time slices")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    with profiling(args):
+        main(vis_only=args.vis_only, workers=args.workers)
\ No newline at end of file
@@ -1,8 +1,9 @@
 from lxml import etree
 from collections import defaultdict
-import pandas as pd
 import html
 
+from instrumentation import span
+
 __author__ = "Jon Ball"
 __version__ = "Autumn 2022"
 
@@ -30,13 +31,15 @@ class ERICparser:
         """
         Call lxml.etree.parse() and save the .xml tree to self.
         """
-        self.tree = etree.parse(path_to_xml) # Parse the .xml file
+        with span("eric.parse"):
+            self.tree = etree.parse(path_to_xml) # Parse the .xml file
         self.root = self.tree.getroot()
         self.num_docs = len(self.root.getchildren()) # Save the number of records in the .xml file
-        self.fields = set(
-            [etree.QName(field).localname for rec in self.iter_metadata() 
-            for field in rec.getchildren()]
-            ) # Save the names of the fields in the .xml file
+        with span("eric.fields", items=self.num_docs):
+            self.fields = set(
+                [etree.QName(field).localname for rec in self.iter_metadata() 
+                for field in rec.getchildren()]
+                ) # Save the names of the fields in the .xml file
 
     def iter_metadata(self):
         """
@@ -71,7 +74,8 @@ class APIparser:
         """
         Call lxml.etree.parse() and save the .xml tree to self.
         """
-        self.tree = etree.parse(path_to_xml) # Parse the .xml file
+        with span("eric.api_parse"):
+            self.tree = etree.parse(path_to_xml) # Parse the .xml file
         self.root = self.tree.getroot()
         # Save the number of docs in the response .xml file
         self.num_docs = len(
@@ -97,6 +101,19 @@ class APIparser:
         Returns:
             dict mapping fields to list of strings (or int for year); or pandas.DataFrame
         """
+        with span("eric.data_fields", items=self.num_docs):
+            d = self._collect_fields()
+
+        if return_df: # Return the API results as a pandas DataFrame
+            import pandas as pd
+            return pd.DataFrame(d).drop(columns=["response"])
+        else:
+            return dict(d)
+
+    def _collect_fields(self):
+        """
+        Function called internally to gather each doc's fields into a dict of lists.
+        """
         d = defaultdict(list)
         for doc in self.iter_docs(): # For each doc's metadata
             # Declare an empty set which will be used to record null values
@@ -123,8 +140,4 @@ class APIparser:
             # Make sure all values in d are of uniform length
             for field in self.fields.difference(field_check):
                 d[field].append(None)
-
-        if return_df: # Return the API results as a pandas DataFrame
-            return pd.DataFrame(d).drop(columns=["response"])
-        else:
-            return dict(d)
\ No newline at end of file
+        return d
\ No newline at end of file
@@ -3,28 +3,38 @@ __version__ = "Winter 2023"
 
 # Python 3.9.1
 
-import networkx as nx
-import matplotlib.pyplot as plt
+# networkx and matplotlib are imported where they are used, so that --help
+# is fast and --metrics_only runs never load matplotlib
 from collections import Counter
+import argparse
 import json
 import time
 import os
 import re
 
+from instrumentation import span, add_profile_args, profiling
+
 # Main function
-def main():
+def main(
+    input_path: str = "data/author_citations.json",
+    output_dir: str = "data/graphs",
+    metrics_only: bool = False
+    ) -> None:
     print("***\n")
     print("Graphing citations...")
     # Load the data
-    citations = load_data("data/author_citations.json")
+    citations = load_data(input_path)
+    draw = not metrics_only
     # Draw the graph
-    draw_graph(filename="soced_graph", data=citations, labels=False, output_dir="data/graphs")
-    # Draw the labeled graph
-    draw_graph(filename="soced_graph_labeled", data=citations,  labels=True, output_dir="data/graphs")
+    draw_graph(filename="soced_graph", data=citations, labels=False, output_dir=output_dir, draw=draw)
+    # Draw the labeled graph; pyplot is never cleared, so this order shapes every saved figure
+    if draw:
+        draw_graph(filename="soced_graph_labeled", data=citations,  labels=True, output_dir=output_dir)
     # Draw the graph with only the top n=50 authors
-    draw_subgraph(filename="soced_graph_top50", data=citations, n=50, labels=False, output_dir="data/graphs")
+    draw_subgraph(filename="soced_graph_top50", data=citations, n=50, labels=False, output_dir=output_dir, draw=draw)
     # Draw the labeled graph with only the top n=50 authors
-    draw_subgraph(filename="soced_graph_top50_labeled", data=citations, n=50, labels=True, output_dir="data/graphs")
+    if draw:
+        draw_subgraph(filename="soced_graph_top50_labeled", data=citations, n=50, labels=True, output_dir=output_dir)
     print("***")
 
 # NetworkX graph of citations
@@ -33,31 +43,39 @@ def draw_graph(
     data: dict[str : list[str]],
     labels: bool,
     output_dir: str,
+    draw: bool = True,
     ) -> None:
-    # Start the timer
-    tock = time.time()
+    import networkx as nx
     # Create the graph
     G = nx.DiGraph()
     print(f"Graph {filename} initialized.")
     G.add_edges_from(get_author_edges(data))
-    # Draw the graph
-    print("   Drawing graph...")
-    pos = nx.spring_layout(G)
-    nx.draw_networkx_nodes(G, pos, node_size=10, edgecolors="black", linewidths=0.1, node_color="#1f77b4")
-    nx.draw_networkx_edges(G, pos, edgelist=G.edges(), edge_color="black", width=0.01, arrowsize=5)
-    if labels:
-        nx.draw_networkx_labels(G, pos, font_size=0.5, font_color="#ffd700") # gold to pair with blues
-    # End the timer
-    print(f"   Graph drawn in {round(time.time() - tock, 2)} seconds.")
+    if draw:
+        import matplotlib.pyplot as plt
+        # Start the timer
+        tock = time.time()
+        with span("graph.draw"):
+            # Draw the graph
+            print("   Drawing graph...")
+            with span("graph.layout", items=G.number_of_nodes()):
+                pos = nx.spring_layout(G)
+            nx.draw_networkx_nodes(G, pos, node_size=10, edgecolors="black", linewidths=0.1, node_color="#1f77b4")
+            nx.draw_networkx_edges(G, pos, edgelist=G.edges(), edge_color="black", width=0.01, arrowsize=5)
+            if labels:
+                nx.draw_networkx_labels(G, pos, font_size=0.5, font_color="#ffd700") # gold to pair with blues
+        # End the timer
+        print(f"   Graph drawn in {round(time.time() - tock, 2)} seconds.")
     # Save the node centrality scores
     print("   Saving node centrality scores...")
-    centrality = nx.degree_centrality(G)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with span("graph.centrality", items=G.number_of_nodes()):
+        centrality = nx.degree_centrality(G)
     with open(os.path.join(output_dir, filename + "_centrality.json"), "w") as outfile:
         json.dump(centrality, outfile)
     # Save the graph
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    plt.savefig(os.path.join(output_dir, filename + ".png"), bbox_inches="tight", dpi=800)
+    if draw:
+        plt.savefig(os.path.join(output_dir, filename + ".png"), bbox_inches="tight", dpi=800)
     # Save for gephi
     nx.write_gexf(G, os.path.join(output_dir, filename + ".gexf"))
     print(f"Graph saved in {output_dir}.\n")
@@ -67,8 +85,10 @@ def draw_subgraph(
     data: dict[str : list[str]],
     n: int,
     labels: bool,
-    output_dir: str
+    output_dir: str,
+    draw: bool = True
     ) -> list[tuple[str, str]]:
+    import networkx as nx
     # Get edges for citations among the top n authors
     nodes = []
     nauthors = [author for author, _ in Counter([cite for cites in data.values() for cite in cites]).most_common(n)]
@@ -76,28 +96,36 @@ def draw_subgraph(
         for cite in cites:
             if author and cite in nauthors:
                 nodes.append((author, cite))
-    # Start the timer
-    tock = time.time()
     # Create the graph
     G = nx.DiGraph()
     print(f"Subgraph initialized.")
     G.add_edges_from(list(set(nodes)))
-    # Draw the graph
-    print("   Drawing subgraph...")
-    pos = nx.spring_layout(G)
-    nx.draw_networkx_nodes(G, pos, node_size=10, edgecolors="black", linewidths=0.1, node_color="#1f77b4")
-    nx.draw_networkx_edges(G, pos, edgelist=G.edges(), edge_color="black", width=0.01, arrowsize=5)
-    if labels:
-        nx.draw_networkx_labels(G, pos, font_size=0.5, font_color="#ffd700")
-    # End the timer
-    print(f"   Subgraph drawn in {round(time.time() - tock, 2)} seconds.")
+    if draw:
+        import matplotlib.pyplot as plt
+        # Start the timer
+        tock = time.time()
+        with span("graph.draw"):
+            # Draw the graph
+            print("   Drawing subgraph...")
+            with span("graph.layout", items=G.number_of_nodes()):
+                pos = nx.spring_layout(G)
+            nx.draw_networkx_nodes(G, pos, node_size=10, edgecolors="black", linewidths=0.1, node_color="#1f77b4")
+            nx.draw_networkx_edges(G, pos, edgelist=G.edges(), edge_color="black", width=0.01, arrowsize=5)
+            if labels:
+                nx.draw_networkx_labels(G, pos, font_size=0.5, font_color="#ffd700")
+        # End the timer
+        print(f"   Subgraph drawn in {round(time.time() - tock, 2)} seconds.")
     # Save the node centrality scores
     print("   Saving node centrality scores...")
-    centrality = nx.betweenness_centrality(G)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with span("graph.centrality", items=G.number_of_nodes()):
+        centrality = nx.betweenness_centrality(G)
     with open(os.path.join(output_dir, filename + "_centrality.json"), "w") as outfile:
         json.dump(centrality, outfile)
     # Save the graph
-    plt.savefig(os.path.join(output_dir, filename + ".png"), bbox_inches="tight", dpi=800)
+    if draw:
+        plt.savefig(os.path.join(output_dir, filename + ".png"), bbox_inches="tight", dpi=800)
     # Save for gephi
     nx.write_gexf(G, os.path.join(output_dir, filename + ".gexf"))
     print(f"Subgraph saved in {output_dir}.\n")
@@ -128,4 +156,12 @@ def load_data(filepath):
     return data
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input_path", default="data/author_citations.json", help="Author citation json")
+    parser.add_argument("-o", "--output_dir", default="data/graphs", help="Output directory for graphs and centrality scores")
+    parser.add_argument("--metrics_only", action="store_true", help="Save centrality scores and .gexf files without drawing")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    with profiling(args):
+        main(args.input_path, args.output_dir, args.metrics_only)
\ No newline at end of file
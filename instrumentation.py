@@ -0,0 +1,202 @@
+__author__ = "Jon Ball"
+__version__ = "Winter 2023"
+
+# Python 3.9.1
+
+from contextlib import contextmanager
+from collections import defaultdict
+from functools import wraps
+import resource
+import time
+import sys
+import os
+
+# Spans are only recorded once enable() is called, e.g. by an entry point's --profile flag
+_enabled = False
+_stats = defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0, "items": 0, "rss_delta_mb": 0.0})
+
+
+class Span:
+    """
+    Timing for one pass through a named block. Records wall time, CPU time,
+    items processed and the change in resident memory.
+    """
+    def __init__(self, name, items=0):
+        self.name = name
+        self.items = items
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rss_delta_mb = 0.0
+
+    def add(self, n=1):
+        """
+        Count items processed inside the span.
+        """
+        self.items += n
+
+    def __enter__(self):
+        self._rss0 = current_rss_mb()
+        self._cpu0 = time.process_time()
+        self._wall0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self._wall0
+        self.cpu = time.process_time() - self._cpu0
+        self.rss_delta_mb = current_rss_mb() - self._rss0
+        stats = _stats[self.name]
+        stats["calls"] += 1
+        stats["wall"] += self.wall
+        stats["cpu"] += self.cpu
+        stats["items"] += self.items
+        stats["rss_delta_mb"] += self.rss_delta_mb
+        return False
+
+
+class _NullSpan:
+    """
+    Stand-in returned by span() while recording is off, so spans cost one call.
+    """
+    def add(self, n=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def reset():
+    _stats.clear()
+
+
+### MEMORY ###
+def maxrss_mb(rusage):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return rusage.ru_maxrss / scale
+
+
+def peak_rss_mb():
+    return maxrss_mb(resource.getrusage(resource.RUSAGE_SELF))
+
+
+def current_rss_mb():
+    # /proc is cheap to read on Linux; elsewhere fall back to the peak
+    try:
+        with open("/proc/self/statm", "r") as rfile:
+            pages = int(rfile.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+### SPANS ###
+def span(name, items=0):
+    """
+    Time the enclosed block under the given name. Returns the Span, so callers
+    can count items with span.add(). Does nothing until enable() is called, so
+    keep spans out of per-record loops: wrap the loop and count with add().
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, items)
+
+
+def timed(name=None):
+    """
+    Decorator form of span(), named after the function unless a name is given.
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+### REPORTING ###
+def summary(file=None):
+    """
+    Print one line per span, slowest first.
+    """
+    file = file or sys.stdout
+    if not _stats:
+        print("No spans recorded.", file=file)
+        return
+    width = max(len(name) for name in _stats)
+    print(f"\n{'span':<{width}}  {'calls':>8}  {'wall (s)':>10}  {'cpu (s)':>10}  "
+          f"{'items':>10}  {'items/s':>10}  {'rss +MB':>8}", file=file)
+    for name, s in sorted(_stats.items(), key=lambda item: -item[1]["wall"]):
+        rate = s["items"] / s["wall"] if s["items"] and s["wall"] else 0
+        print(f"{name:<{width}}  {s['calls']:>8}  {s['wall']:>10.2f}  {s['cpu']:>10.2f}  "
+              f"{s['items']:>10}  {rate:>10.1f}  {s['rss_delta_mb']:>8.1f}", file=file)
+    print(f"Peak RSS: {peak_rss_mb():.1f} MB\n", file=file)
+
+
+def add_profile_args(parser):
+    """
+    Add the shared --profile options to an entry point's argument parser.
+    """
+    parser.add_argument("--profile", action="store_true", help="Print a summary of timed spans on exit")
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default=None,
+                        help="Also run a function-level profiler (implies --profile)")
+    parser.add_argument("--profile_out", default=None,
+                        help="Write profiler output here instead of printing it")
+
+
+@contextmanager
+def profiling(args):
+    """
+    Wrap an entry point's main() according to the --profile options.
+    """
+    if not (args.profile or args.profiler):
+        yield
+        return
+    enable()
+    profiler = None
+    if args.profiler == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif args.profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        except ImportError:
+            print("pyinstrument is not installed; reporting spans only.")
+    try:
+        yield
+    finally:
+        if args.profiler == "cprofile":
+            profiler.disable()
+            if args.profile_out:
+                profiler.dump_stats(args.profile_out)
+                print(f"cProfile stats saved to {args.profile_out}.")
+            else:
+                import pstats
+                pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+        elif profiler is not None:
+            profiler.stop()
+            if args.profile_out:
+                with open(args.profile_out, "w") as wfile:
+                    wfile.write(profiler.output_html())
+                print(f"pyinstrument report saved to {args.profile_out}.")
+            else:
+                print(profiler.output_text(unicode=True, color=False))
+        summary()
@@ -4,15 +4,17 @@ __verion__ = "Winter 2023"
 #Dependencies: tesseract poppler
 #Python 3.9.1
 
-from pdf2image import convert_from_path
-from PIL import Image
 from tqdm import tqdm
-import pytesseract
 import argparse
 import os
 
+from instrumentation import span, add_profile_args, profiling
+
 # Convert the PDFs to text
 def convert_pdfs_to_txt(pdf_dir, txt_dir):
+    # Imported here so --help does not wait on the OCR stack
+    from pdf2image import convert_from_path
+    import pytesseract
 
     pdfs = []
     for root, nodirs, files in os.walk(pdf_dir):
@@ -20,13 +22,15 @@ def convert_pdfs_to_txt(pdf_dir, txt_dir):
             pdfs.append(root + "/" + file)
     
     for fpath in tqdm(pdfs):
-        doc = convert_from_path(fpath)
+        with span("pdf2txt.rasterize", items=1):
+            doc = convert_from_path(fpath)
         path, filename = os.path.split(fpath)
         basename, extension = os.path.splitext(filename)
         newfilename = os.path.join(txt_dir, basename + ".txt")
         with open(newfilename, "w") as outfile:
             for page_number, page_data in enumerate(doc):
-                txt = pytesseract.image_to_string(page_data)
+                with span("pdf2txt.ocr", items=1):
+                    txt = pytesseract.image_to_string(page_data)
                 outfile.write(txt)
 
 
@@ -35,10 +39,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--pdf_directory", required=True, help="path to directory containing PDFs")
     parser.add_argument("-t", "--text_directory", required=True, help="path to directory to save text files")
-    args = vars(parser.parse_args())
+    add_profile_args(parser)
+    parsed = parser.parse_args()
+    args = vars(parsed)
     # Get the paths to the PDFs and text files
     pdf_dir = args["pdf_directory"]
     txt_dir = args["text_directory"]
     print("Converting PDFs to text files...\n")
-    convert_pdfs_to_txt(pdf_dir, txt_dir)
+    with profiling(parsed):
+        convert_pdfs_to_txt(pdf_dir, txt_dir)
     print("\nDone!")
\ No newline at end of file
@@ -0,0 +1,257 @@
+__author__ = "Jon Ball"
+__version__ = "Winter 2023"
+
+# Python 3.9.1
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import subprocess
+import argparse
+import hashlib
+import json
+import time
+import sys
+import os
+
+from instrumentation import maxrss_mb
+
+# Run state and per-stage run log
+STATE_PATH = "data/pipeline_state.json"
+LOG_PATH = "data/pipeline_runs.jsonl"
+
+# Recorded in place of input hashes while a stage runs and after it fails,
+# so partial outputs are never taken as up to date
+DIRTY = "dirty"
+
+
+class Stage:
+    """
+    A single script in the pipeline, declared by the files it reads and writes.
+    Directories may be given as inputs or outputs; their contents are hashed recursively.
+    """
+    def __init__(self, name, command, inputs, outputs):
+        self.name = name
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def depends_on(self, other):
+        """
+        True if this stage reads anything the other stage writes.
+        """
+        return any(
+            inp == out or inp.startswith(out.rstrip("/") + "/")
+            for inp in self.inputs for out in other.outputs)
+
+
+def build_stages(pdf_dir, txt_dir, eric_dir):
+    # Each script and the local modules it imports are inputs of its own stage,
+    # so editing any of them re-runs it
+    py = sys.executable
+    return [
+        Stage("pdf2txt",
+              [py, "pdf2txt.py", "-p", pdf_dir, "-t", txt_dir],
+              inputs=["pdf2txt.py", "instrumentation.py", pdf_dir],
+              outputs=[txt_dir]),
+        Stage("citations",
+              [py, "citations.py", "-i", txt_dir, "-o", "data"],
+              inputs=["citations.py", "instrumentation.py", "spacy_loader.py", txt_dir],
+              outputs=["data/txt2year.json", "data/author_citations.json", "data/cited_journals.json"]),
+        Stage("graph",
+              [py, "graph.py"],
+              inputs=["graph.py", "instrumentation.py", "data/author_citations.json"],
+              outputs=["data/graphs"]),
+        Stage("doc2vec",
+              [py, "doc2vec.py", "-i", eric_dir],
+              inputs=["doc2vec.py", "eric_parser.py", "instrumentation.py", "spacy_loader.py", eric_dir],
+              outputs=["data/vsm/vectors.npy", "data/vsm/vsm.png"]),
+        Stage("dytm",
+              [py, "dytm.py"],
+              inputs=["dytm.py", "instrumentation.py", "spacy_loader.py", "data/txt2year.json", txt_dir],
+              outputs=["data/ldaseq/ldaseq20epochs50topics.model", "data/preprocessed_corpus.json"]),
+    ]
+
+
+### FRESHNESS CHECKS ###
+# Hash a file, or every file under a directory
+def hash_path(path, digests):
+    sha = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in sorted(os.walk(path)):
+            for file in sorted(files):
+                fpath = os.path.join(root, file)
+                sha.update(os.path.relpath(fpath, path).encode())
+                sha.update(file_digest(fpath, digests).encode())
+    elif os.path.exists(path):
+        sha.update(file_digest(path, digests).encode())
+    return sha.hexdigest()
+
+
+def file_digest(fpath, digests):
+    # Digests are cached by (size, mtime), so unchanged files are only stat'ed, never re-read
+    st = os.stat(fpath)
+    key = [st.st_size, st.st_mtime_ns]
+    cached = digests.get(fpath)
+    if cached is not None and cached[:2] == key:
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(fpath, "rb") as rfile:
+        for chunk in iter(lambda: rfile.read(1 << 20), b""):
+            sha.update(chunk)
+    digests[fpath] = key + [sha.hexdigest()]
+    return sha.hexdigest()
+
+
+# Latest (or earliest) modification time of a file or directory tree
+def path_mtime(path, latest=True):
+    mtimes = [os.path.getmtime(path)]
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            mtimes += [os.path.getmtime(os.path.join(root, file)) for file in files]
+    return max(mtimes) if latest else min(mtimes)
+
+
+def is_fresh(stage, input_hashes, state):
+    # A stage is fresh when all of its outputs exist and its inputs are unchanged
+    if not all(os.path.exists(out) for out in stage.outputs):
+        return False
+    recorded = state["stages"].get(stage.name)
+    if recorded == DIRTY:
+        return False
+    if recorded is not None:
+        return recorded == input_hashes
+    # Never attempted by the pipeline: fall back to comparing modification times
+    newest_input = max((path_mtime(inp) for inp in stage.inputs if os.path.exists(inp)), default=0)
+    oldest_output = min(path_mtime(out, latest=False) for out in stage.outputs)
+    return oldest_output >= newest_input
+
+
+### STAGE EXECUTION ###
+def run_stage(stage):
+    # Make sure output directories exist before the script writes to them
+    for out in stage.outputs:
+        outdir = out if not os.path.splitext(out)[1] else os.path.dirname(out)
+        if outdir and not os.path.exists(outdir):
+            os.makedirs(outdir)
+    tock = time.time()
+    proc = subprocess.Popen(stage.command)
+    # wait4 reports resource usage for this child alone, even with stages running concurrently
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "returncode": proc.returncode,
+        "wall_time": round(time.time() - tock, 2),
+        "peak_rss_mb": round(maxrss_mb(rusage), 1),
+    }
+
+
+def main(pdf_dir, txt_dir, eric_dir, force=False, dry_run=False, workers=2):
+    stages = build_stages(pdf_dir, txt_dir, eric_dir)
+    deps = {s.name: [o.name for o in stages if o is not s and s.depends_on(o)] for s in stages}
+    state = load_state()
+
+    print(f"Running pipeline of {len(stages)} stages...\n")
+    done, failed, would_run = set(), set(), set()
+    pending = {s.name: s for s in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Launch every stage whose upstream stages have all finished
+            for name, stage in list(pending.items()):
+                if any(d in failed for d in deps[name]):
+                    print(f"[{name}] skipped: upstream stage failed.")
+                    failed.add(name)
+                    del pending[name]
+                    continue
+                if not all(d in done for d in deps[name]):
+                    continue
+                del pending[name]
+                input_hashes = {inp: hash_path(inp, state["files"]) for inp in stage.inputs}
+                upstream_reruns = any(d in would_run for d in deps[name])
+                if not force and not upstream_reruns and is_fresh(stage, input_hashes, state):
+                    print(f"[{name}] up to date.")
+                    # Record hashes for stages judged fresh by mtime, so later runs compare content
+                    state["stages"].setdefault(name, input_hashes)
+                    done.add(name)
+                    continue
+                if dry_run:
+                    # Downstream stages would see new inputs, so they would run too
+                    print(f"[{name}] would run: {' '.join(stage.command)}")
+                    would_run.add(name)
+                    done.add(name)
+                    continue
+                print(f"[{name}] running...")
+                state["stages"][name] = DIRTY
+                save_state(state)
+                running[executor.submit(run_stage, stage)] = (stage, input_hashes)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, input_hashes = running.pop(future)
+                result = future.result()
+                if result["returncode"] == 0:
+                    done.add(stage.name)
+                    state["stages"][stage.name] = input_hashes
+                    status = "ok"
+                else:
+                    failed.add(stage.name)
+                    state["stages"][stage.name] = DIRTY
+                    status = "failed"
+                save_state(state)
+                print(f"[{stage.name}] {status} in {result['wall_time']} seconds, "
+                      f"peak memory {result['peak_rss_mb']} MB.")
+                log_run(stage.name, status, result)
+
+    if not dry_run:
+        save_state(state)
+    print(f"\n{len(done)} stages complete, {len(failed)} failed.")
+    return not failed
+
+
+# Per-stage input hashes (or DIRTY) and the cache of per-file digests
+def load_state():
+    state = {"stages": {}, "files": {}}
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH, "r") as rfile:
+            state.update(json.load(rfile))
+    return state
+
+
+# Write the run state after every stage, so an interrupted run keeps it
+def save_state(state):
+    # Forget digests of files that no longer exist
+    state["files"] = {f: d for f, d in state["files"].items() if os.path.exists(f)}
+    if not os.path.exists(os.path.dirname(STATE_PATH)):
+        os.makedirs(os.path.dirname(STATE_PATH))
+    with open(STATE_PATH + ".tmp", "w") as wfile:
+        json.dump(state, wfile, indent=2)
+    os.replace(STATE_PATH + ".tmp", STATE_PATH)
+
+
+# Append a stage's timing and memory to the run log
+def log_run(name, status, result):
+    if not os.path.exists(os.path.dirname(LOG_PATH)):
+        os.makedirs(os.path.dirname(LOG_PATH))
+    with open(LOG_PATH, "a") as wfile:
+        wfile.write(json.dumps({
+            "stage": name,
+            "status": status,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **result,
+        }) + "\n")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--pdf_dir", default="data/pdfs", help="Input directory of article PDFs")
+    parser.add_argument("-t", "--txt_dir", default="data/txts", help="Directory for OCR'd text files")
+    parser.add_argument("-e", "--eric_dir", default="eric_data", help="Directory of ERIC .xml files")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="Number of stages to run concurrently")
+    parser.add_argument("--force", action="store_true", help="Run every stage regardless of freshness")
+    parser.add_argument("--dry_run", action="store_true", help="Report which stages would run")
+    args = parser.parse_args()
+
+    ok = main(args.pdf_dir, args.txt_dir, args.eric_dir,
+              force=args.force, dry_run=args.dry_run, workers=args.workers)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,23 @@
+__author__ = "Jon Ball"
+__version__ = "Winter 2023"
+
+# Python 3.9.1
+
+from functools import lru_cache
+
+from instrumentation import span
+
+
+@lru_cache(maxsize=None)
+def load_spacy(name: str, pipes: tuple = ()):
+    """
+    Load a spaCy model once per process, with any extra pipes added in order.
+    Models are cached by name and pipes, so callers that add different pipes
+    never share (and mutate) the same pipeline.
+    """
+    import spacy
+    with span("spacy.load"):
+        nlp = spacy.blank("en") if name == "blank" else spacy.load(name)
+    for pipe in pipes:
+        nlp.add_pipe(pipe)
+    return nlp